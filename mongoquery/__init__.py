@@ -3,8 +3,10 @@ mongoquery provides a straightforward API to match Python objects against
 MongoDB Query Language queries.
 """
 
+import functools
 import re
 from collections.abc import Mapping, Sequence
+from operator import eq, ge, gt, le, lt
 
 
 class QueryError(Exception):
@@ -17,88 +19,536 @@ class _Undefined(object):
     pass
 
 
+_UNDEF = _Undefined()
+
+
 def is_non_string_sequence(entry):
     """Returns True if entry is a Python sequence iterable, and not a string"""
+    # Fast paths for the concrete types produced by JSON/YAML parsers, ABC
+    # isinstance checks are comparatively slow.
+    entry_type = type(entry)
+    if entry_type is list or entry_type is tuple:
+        return True
+    if entry_type is str or entry_type is dict:
+        return False
     return isinstance(entry, Sequence) and not isinstance(entry, str)
 
 
+def _is_sequence(entry):
+    """Returns True if entry is a Sequence, checking for lists and tuples first"""
+    entry_type = type(entry)
+    return entry_type is list or entry_type is tuple or isinstance(entry, Sequence)
+
+
+def _is_mapping(entry):
+    """Returns True if entry is a Mapping, checking for plain dicts first"""
+    return type(entry) is dict or isinstance(entry, Mapping)
+
+
+# Number of distinct field paths whose split keys and extractors are kept
+_PATH_CACHE_SIZE = 8192
+
+
+@functools.lru_cache(maxsize=_PATH_CACHE_SIZE)
+def _split_path(path):
+    """Splits a dotted field path into a tuple of keys"""
+    return tuple(path.split("."))
+
+
+@functools.lru_cache(maxsize=_PATH_CACHE_SIZE)
+def _make_extractor(path):
+    """Returns a function extracting the value at path, a tuple of keys, from an
+    entry. Whether each key indexes into sequences is decided once, here."""
+    if not path:
+        return lambda entry: entry
+
+    key = path[0]
+    try:
+        index = int(key)
+    except ValueError:
+        index = None
+    # the last key returns its value directly, saving a call per extraction
+    extract_rest = _make_extractor(path[1:]) if len(path) > 1 else None
+
+    def extract(entry):
+        if entry is None:
+            return entry
+        if is_non_string_sequence(entry):
+            if index is None:
+                return [extract(item) for item in entry]
+            value = entry[index]
+        elif _is_mapping(entry) and key in entry:
+            value = entry[key]
+        else:
+            return _UNDEF
+        return value if extract_rest is None else extract_rest(value)
+
+    return extract
+
+
+@functools.lru_cache(maxsize=_PATH_CACHE_SIZE)
+def _extractor_for(path):
+    """Returns the extractor for a dotted field path"""
+    return _make_extractor(_split_path(path))
+
+
+def _path_exists(keys, condition, entry):
+    """Returns condition if the path given as a tuple of keys exists in entry,
+    descending into every element of arrays met along the way"""
+    for i, key in enumerate(keys):
+        is_sequence = _is_sequence(entry)
+        if is_sequence and not key.isdigit():
+            suffix = keys[i:]
+            for elem in entry:
+                if _path_exists(suffix, condition, elem) == condition:
+                    return condition
+            return not condition
+        elif is_sequence:
+            key = int(key)
+        try:
+            entry = entry[key]
+        except (TypeError, IndexError, KeyError):
+            return not condition
+    return condition
+
+
+def _freeze(definition):
+    """Converts a query definition into a hashable value, tagging containers and
+    scalars with their type so that e.g. 1 and True aren't confused"""
+    if _is_mapping(definition):
+        return (
+            dict,
+            tuple((_freeze(key), _freeze(value)) for key, value in definition.items()),
+        )
+    if isinstance(definition, list):
+        return (list, tuple(_freeze(item) for item in definition))
+    if isinstance(definition, tuple):
+        return (tuple, tuple(_freeze(item) for item in definition))
+    return (type(definition), definition)
+
+
+def _thaw(frozen):
+    """Converts a value returned by _freeze back into a query definition"""
+    kind, value = frozen
+    if kind is dict:
+        return {_thaw(key): _thaw(item) for key, item in value}
+    if kind is list or kind is tuple:
+        return kind(_thaw(item) for item in value)
+    return value
+
+
+@functools.lru_cache(maxsize=1024)
+def _compiled(cls, frozen_definition):
+    """Builds a query from a frozen definition, memoized for Query.compile"""
+    return cls(_thaw(frozen_definition))
+
+
+# Matches regular expressions given as "/pattern/flags" strings
+_REGEX_WRAPPER = re.compile(r"\A/(.+)/([imsx]{,4})\Z", re.DOTALL)
+
+_REGEX_FLAG_MAP = {"i": re.I, "m": re.M, "s": re.S, "x": re.X}
+
+
+def _compile_regex(condition):
+    """Compiles a $regex condition, given either as a compiled pattern, a plain
+    pattern string or a "/pattern/flags" string"""
+    # If the caller has supplied a compiled regex, assume options are already
+    # included.
+    if isinstance(condition, re.Pattern):
+        return condition
+    try:
+        regex = _REGEX_WRAPPER.match(condition)
+    except TypeError:
+        raise QueryError(
+            "{!r} is not a regular expression and should be a string".format(condition)
+        )
+
+    flags = 0
+    if regex:
+        options = regex.group(2)
+        for option in options:
+            flags |= _REGEX_FLAG_MAP[option]
+        exp = regex.group(1)
+    else:
+        exp = condition
+
+    try:
+        return re.compile(exp, flags=flags)
+    except Exception as error:
+        raise QueryError(
+            "{!r} failed to execute with error {!r}".format(condition, error)
+        )
+
+
+def _match_all(matchers):
+    """Returns a function matching an entry if all matchers match it"""
+    # A lone matcher is returned as is, so that nested single-key conditions
+    # don't add a call per level. Its result may not be a bool.
+    if len(matchers) == 1:
+        return matchers[0]
+
+    def match_all(entry, matchers=tuple(matchers)):
+        for matcher in matchers:
+            if not matcher(entry):
+                return False
+        return True
+
+    return match_all
+
+
+# Comparison operators inlined into compiled queries rather than calling the
+# Query method implementing them
+_COMPARISONS = {"$eq": eq, "$gt": gt, "$gte": ge, "$lt": lt, "$lte": le}
+
+_BSON_TYPE: dict[int, type] = {
+    1: float,
+    2: str,
+    3: Mapping,
+    4: Sequence,
+    5: bytearray,
+    7: str,  # object id (uuid)
+    8: bool,
+    9: str,  # date (UTC datetime)
+    10: type(None),
+    11: re.Pattern,  # regex,
+    13: str,  # Javascript
+    15: str,  # JavaScript (with scope)
+    16: int,  # 32-bit integer
+    17: int,  # Timestamp
+    18: int,  # 64-bit integer
+}
+
+_BSON_ALIAS = {
+    "double": 1,
+    "string": 2,
+    "object": 3,
+    "array": 4,
+    "binData": 5,
+    "objectId": 7,
+    "bool": 8,
+    "date": 9,
+    "null": 10,
+    "regex": 11,
+    "javascript": 13,
+    "javascriptWithScope": 15,
+    "int": 16,
+    "timestamp": 17,
+    "long": 18,
+}
+
+_NUMBER_TYPES = (float, int)
+
+
 class Query(object):
-    """The Query class is used to match an object against a MongoDB-like query"""
+    """The Query class is used to match an object against a MongoDB-like query
+
+    Subclasses may override the methods named in _OPERATORS and
+    _EXPR_OPERATORS, or extend those tables with new operators. $and, $nor,
+    $or, $not, $elemMatch, $expr and $regex are compiled directly and can't
+    be overridden."""
 
     def __init__(self, definition):
         self._definition = definition
+        self._matcher = self._compile(definition)
+
+    @classmethod
+    def compile(cls, definition):
+        """Returns a Query for definition, reusing a previously built one for
+        an identical definition when possible"""
+        frozen_definition = _freeze(definition)
+        try:
+            hash(frozen_definition)
+        except TypeError:
+            return cls(definition)
+        return _compiled(cls, frozen_definition)
 
     def match(self, entry):
         """Matches the entry object against the query specified on instanciation"""
-        return self._match(self._definition, entry)
+        return bool(self._matcher(entry))
+
+    #############
+    # Compilation
+    #############
 
-    def _match(self, condition, entry) -> bool:
+    def _compile(self, condition):
+        """Compiles a condition into a function matching an entry against it"""
         if isinstance(condition, Mapping):
-            return all(
-                self._process_condition(sub_operator, sub_condition, entry)
-                for sub_operator, sub_condition in condition.items()
+            return _match_all(
+                [
+                    self._compile_condition(sub_operator, sub_condition)
+                    for sub_operator, sub_condition in condition.items()
+                ]
             )
-        if is_non_string_sequence(entry):
-            return condition in entry
-        return condition == entry
 
-    def _extract(self, entry, path):
-        if not path:
-            return entry
-        if entry is None:
-            return entry
-        if is_non_string_sequence(entry):
-            try:
-                index = int(path[0])
-                return self._extract(entry[index], path[1:])
-            except ValueError:
-                return [self._extract(item, path) for item in entry]
-        elif isinstance(entry, Mapping) and path[0] in entry:
-            return self._extract(entry[path[0]], path[1:])
-        else:
-            return _Undefined()
-
-    def _path_exists(self, operator, condition, entry):
-        keys_list = list(operator.split("."))
-        for i, k in enumerate(keys_list):
-            if isinstance(entry, Sequence) and not k.isdigit():
-                for elem in entry:
-                    operator = ".".join(keys_list[i:])
-                    if self._path_exists(operator, condition, elem) == condition:
-                        return condition
-                return not condition
-            elif isinstance(entry, Sequence):
-                k = int(k)
-            try:
-                entry = entry[k]
-            except (TypeError, IndexError, KeyError):
-                return not condition
-        return condition
+        def match_value(entry):
+            if is_non_string_sequence(entry):
+                return condition in entry
+            return condition == entry
 
-    def _process_condition(self, operator, condition, entry):
-        if isinstance(condition, Mapping) and "$exists" in condition:
-            if isinstance(operator, str) and operator.find(".") != -1:
-                return self._path_exists(operator, condition["$exists"], entry)
-            elif condition["$exists"] != (operator in entry):
-                return False
-            elif tuple(condition.keys()) == ("$exists",):
-                return True
+        return match_value
+
+    def _compile_condition(self, operator, condition):
+        """Compiles a single operator or field condition"""
+        if _is_mapping(condition) and "$exists" in condition:
+            return self._compile_exists(operator, condition)
         if isinstance(operator, str):
             if operator.startswith("$"):
+                return self._compile_operator(operator, condition)
+
+            extract = _extractor_for(operator)
+            match_extracted = self._compile(condition)
+
+            def match_path(entry):
                 try:
-                    return getattr(self, "_" + operator[1:])(condition, entry)
-                except AttributeError:
-                    raise QueryError("{!r} operator isn't supported".format(operator))
-            else:
-                try:
-                    extracted_data = self._extract(entry, operator.split("."))
+                    extracted_data = extract(entry)
                 except IndexError:
-                    extracted_data = _Undefined()
-        else:
+                    extracted_data = _UNDEF
+                return match_extracted(extracted_data)
+
+            return match_path
+
+        match_item = self._compile(condition)
+
+        def match_key(entry):
             if operator not in entry:
                 return False
-            extracted_data = entry[operator]
-        return self._match(condition, extracted_data)
+            return match_item(entry[operator])
+
+        return match_key
+
+    def _compile_exists(self, operator, condition):
+        """Compiles a condition using $exists, specializing it for dotted paths
+        and for $exists used on its own"""
+        exists = condition["$exists"]
+        if isinstance(operator, str) and "." in operator:
+            keys = _split_path(operator)
+            return lambda entry: _path_exists(keys, exists, entry)
+        if len(condition) == 1:
+            return lambda entry: exists == (operator in entry)
+
+        if isinstance(operator, str) and operator.startswith("$"):
+            match_rest = self._compile_operator(operator, condition)
+        else:
+            match_rest = self._compile_condition(
+                operator,
+                {key: value for key, value in condition.items() if key != "$exists"},
+            )
+
+        def match_exists(entry):
+            if exists != (operator in entry):
+                return False
+            return match_rest(entry)
+
+        return match_exists
+
+    def _compile_operator(self, operator, condition):
+        """Compiles a query operator, falling back to calling the method
+        implementing it for operators which aren't specialized"""
+        if operator in ("$and", "$nor", "$or"):
+            return self._compile_logical(operator, condition)
+        if operator == "$not":
+            match_condition = self._compile(condition)
+            return lambda entry: not match_condition(entry)
+        if operator == "$elemMatch":
+            if not _is_mapping(condition):
+                raise QueryError(
+                    "$elemMatch has been attributed incorrect argument {!r}".format(
+                        condition
+                    )
+                )
+            match_element = self._compile(condition)
+
+            def match_elements(entry):
+                if not _is_sequence(entry):
+                    return False
+                return any(map(match_element, entry))
+
+            return match_elements
+        if operator == "$expr":
+            if not _is_mapping(condition):
+                raise QueryError(
+                    "$expr has been attributed incorrect argument {!r}".format(
+                        condition
+                    )
+                )
+            return self._compile_expr(condition)
+        if operator == "$regex":
+            pattern = _compile_regex(condition)
+            return lambda entry: (
+                isinstance(entry, str) and pattern.search(entry) is not None
+            )
+
+        method = self._operator(operator)
+        if self._is_overridden(self._OPERATORS[operator]):
+            return lambda entry: method(condition, entry)
+        compare = _COMPARISONS.get(operator)
+        if compare is not None:
+
+            def match_comparison(entry, compare=compare, condition=condition):
+                try:
+                    return compare(entry, condition)
+                except TypeError:
+                    return False
+
+            return match_comparison
+        if operator == "$ne":
+            return lambda entry, condition=condition: entry != condition
+        if operator in ("$in", "$nin") and is_non_string_sequence(condition):
+            match_in = self._compile_in(condition)
+            if operator == "$nin":
+                return lambda entry: not match_in(entry)
+            return match_in
+        if operator == "$all":
+            try:
+                items = list(condition)
+            except TypeError:
+                pass
+            else:
+                return _match_all([self._compile(item) for item in items])
+        if (
+            operator == "$mod"
+            and is_non_string_sequence(condition)
+            and len(condition) == 2
+        ):
+            divisor, remainder = condition
+            return lambda entry: entry % divisor == remainder
+        return lambda entry: method(condition, entry)
+
+    def _compile_in(self, condition):
+        """Compiles a $in condition, testing membership against a set of its
+        members when they are hashable"""
+        try:
+            members = frozenset(condition)
+        except TypeError:
+            return lambda entry: self._in(condition, entry)
+
+        def match_in(entry):
+            entry_type = type(entry)
+            try:
+                if entry_type is list or entry_type is tuple:
+                    for elem in entry:
+                        if elem in members:
+                            return True
+                    return False
+                if not is_non_string_sequence(entry):
+                    return entry in members
+            except TypeError:
+                # unhashable values, e.g. documents, are compared one by one
+                pass
+            return self._in(condition, entry)
+
+        return match_in
+
+    def _compile_logical(self, operator, condition):
+        """Compiles a $and, $nor or $or condition. Sub-conditions are evaluated in
+        the order given, as earlier ones may guard later ones."""
+        if not isinstance(condition, Sequence):
+            raise QueryError(
+                "{} has been attributed incorrect argument {!r}".format(
+                    operator, condition
+                )
+            )
+        matchers = tuple(self._compile(sub_condition) for sub_condition in condition)
+
+        if operator == "$and":
+            return _match_all(matchers)
+
+        if operator == "$nor":
+
+            def match_nor(entry):
+                for matcher in matchers:
+                    if matcher(entry):
+                        return False
+                return True
+
+            return match_nor
+
+        def match_or(entry):
+            for matcher in matchers:
+                if matcher(entry):
+                    return True
+            return False
+
+        return match_or
+
+    def _compile_expr(self, condition):
+        """Compiles a $expr condition"""
+        return _match_all(
+            [
+                self._compile_expr_condition(sub_operator, sub_condition)
+                for sub_operator, sub_condition in condition.items()
+            ]
+        )
+
+    def _compile_expr_condition(self, operator, condition):
+        """Compiles a single $expr condition, see _process_expr_condition"""
+        if (
+            operator in self._EXPR_QUERY_OPERATORS
+            and is_non_string_sequence(condition)
+            and len(condition) == 2
+        ):
+            method = self._operator(operator)
+            resolve_left = self._compile_resolver(condition[0])
+            resolve_right = self._compile_resolver(condition[1])
+
+            def match_expr_condition(entry):
+                # resolve operands in order, so errors match _process_expr_condition
+                left = resolve_left(entry)
+                return method(resolve_right(entry), left)
+
+            return match_expr_condition
+        return lambda entry: self._process_expr_condition(operator, condition, entry)
+
+    def _compile_resolver(self, condition):
+        """Compiles an expression into a function resolving it against an entry,
+        see _resolve_expr"""
+        if _is_mapping(condition) and len(condition) == 1:
+            operator, sub_condition = next(iter(condition.items()))
+            method = self._expr_operator(operator)
+            if (
+                operator == "$concat"
+                and is_non_string_sequence(sub_condition)
+                and not self._is_overridden(self._EXPR_OPERATORS[operator])
+            ):
+                return self._compile_concat(sub_condition)
+            return lambda entry: method(sub_condition, entry)
+        if is_non_string_sequence(condition):
+            resolvers = [
+                self._compile_resolver(sub_condition) for sub_condition in condition
+            ]
+            return lambda entry: [resolve(entry) for resolve in resolvers]
+        if isinstance(condition, str) and condition.startswith("$"):
+            return _extractor_for(condition[1:])
+        if _is_mapping(condition):
+            return lambda entry: self._resolve_expr(condition, entry)
+        return lambda entry: condition
+
+    def _compile_concat(self, condition):
+        """Compiles a $concat expression, joining adjacent literal strings once"""
+        parts = []
+        for sub_condition in condition:
+            if isinstance(sub_condition, str) and not sub_condition.startswith("$"):
+                if parts and type(parts[-1]) is str:
+                    parts[-1] += sub_condition
+                else:
+                    parts.append(sub_condition)
+            elif _is_mapping(sub_condition) or isinstance(sub_condition, str):
+                parts.append(self._compile_resolver(sub_condition))
+            else:
+                raise QueryError("$concat with non-string references")
+
+        if len(parts) == 1 and type(parts[0]) is str:
+            static = parts[0]
+            return lambda entry: static
+
+        def concat(entry):
+            resolved = [part if type(part) is str else part(entry) for part in parts]
+            try:
+                return "".join(resolved)
+            except TypeError:
+                raise QueryError("$concat with non-string references")
+
+        return concat
 
     ##################
     # Common operators
@@ -170,36 +620,6 @@ class Query(object):
     def _nin(self, condition, entry):
         return not self._in(condition, entry)
 
-    ###################
-    # Logical operators
-    ###################
-
-    def _and(self, condition, entry):
-        if isinstance(condition, Sequence):
-            return all(self._match(sub_condition, entry) for sub_condition in condition)
-        raise QueryError(
-            "$and has been attributed incorrect argument {!r}".format(condition)
-        )
-
-    def _nor(self, condition, entry):
-        if isinstance(condition, Sequence):
-            return all(
-                not self._match(sub_condition, entry) for sub_condition in condition
-            )
-        raise QueryError(
-            "$nor has been attributed incorrect argument {!r}".format(condition)
-        )
-
-    def _not(self, condition, entry):
-        return not self._match(condition, entry)
-
-    def _or(self, condition, entry):
-        if isinstance(condition, Sequence):
-            return any(self._match(sub_condition, entry) for sub_condition in condition)
-        raise QueryError(
-            "$or has been attributed incorrect argument {!r}".format(condition)
-        )
-
     ###################
     # Element operators
     ###################
@@ -208,58 +628,18 @@ class Query(object):
     def _type(condition, entry):
         # TODO: further validation to ensure the right type
         # rather than just checking
-        bson_type: dict[int, type] = {
-            1: float,
-            2: str,
-            3: Mapping,
-            4: Sequence,
-            5: bytearray,
-            7: str,  # object id (uuid)
-            8: bool,
-            9: str,  # date (UTC datetime)
-            10: type(None),
-            11: re.Pattern,  # regex,
-            13: str,  # Javascript
-            15: str,  # JavaScript (with scope)
-            16: int,  # 32-bit integer
-            17: int,  # Timestamp
-            18: int,  # 64-bit integer
-        }
-        bson_alias = {
-            "double": 1,
-            "string": 2,
-            "object": 3,
-            "array": 4,
-            "binData": 5,
-            "objectId": 7,
-            "bool": 8,
-            "date": 9,
-            "null": 10,
-            "regex": 11,
-            "javascript": 13,
-            "javascriptWithScope": 15,
-            "int": 16,
-            "timestamp": 17,
-            "long": 18,
-        }
-
         if condition == "number":
-            return any(
-                [
-                    isinstance(entry, bson_type[bson_alias[alias]])
-                    for alias in ["double", "int", "long"]
-                ]
-            )
+            return isinstance(entry, _NUMBER_TYPES)
 
         # resolves bson alias, or keeps original condition value
-        condition = bson_alias.get(condition, condition)
+        condition = _BSON_ALIAS.get(condition, condition)
 
-        if condition not in bson_type:
+        if condition not in _BSON_TYPE:
             raise QueryError(
                 "$type has been used with unknown type {!r}".format(condition)
             )
 
-        return isinstance(entry, bson_type[condition])
+        return isinstance(entry, _BSON_TYPE[condition])
 
     _exists = _noop
 
@@ -271,40 +651,6 @@ class Query(object):
     def _mod(condition, entry):
         return entry % condition[0] == condition[1]
 
-    @staticmethod
-    def _regex(condition, entry):
-        if not isinstance(entry, str):
-            return False
-        # If the caller has supplied a compiled regex, assume options are already
-        # included.
-        if isinstance(condition, re.Pattern):
-            return bool(re.search(condition, entry))
-        try:
-            regex = re.match(r"\A/(.+)/([imsx]{,4})\Z", condition, flags=re.DOTALL)
-        except TypeError:
-            raise QueryError(
-                "{!r} is not a regular expression and should be a string".format(
-                    condition
-                )
-            )
-
-        flags = 0
-        if regex:
-            options = regex.group(2)
-            for option in options:
-                flags |= getattr(re, option.upper())
-            exp = regex.group(1)
-        else:
-            exp = condition
-
-        try:
-            match = re.search(exp, entry, flags=flags)
-        except Exception as error:
-            raise QueryError(
-                "{!r} failed to execute with error {!r}".format(condition, error)
-            )
-        return bool(match)
-
     _options = _text = _where = _not_implemented
 
     #################
@@ -312,18 +658,7 @@ class Query(object):
     #################
 
     def _all(self, condition, entry):
-        return all(self._match(item, entry) for item in condition)
-
-    def _elemMatch(self, condition, entry):
-        if not isinstance(entry, Sequence):
-            return False
-        return any(
-            all(
-                self._process_condition(sub_operator, sub_condition, element)
-                for sub_operator, sub_condition in condition.items()
-            )
-            for element in entry
-        )
+        return all(self._compile(item)(entry) for item in condition)
 
     @staticmethod
     def _size(condition, entry):
@@ -349,62 +684,91 @@ class Query(object):
 
     def _expr_concat(self, condition, entry):
         assert isinstance(condition, Sequence)
-        resolved = [
-            self._resolve_expr(sub_condition, entry) for sub_condition in condition
-        ]
-        if not all(isinstance(elem, str) for elem in resolved):
-            raise QueryError("$concat with non-string references")
-        return "".join(resolved)  # type: ignore
+        parts = []
+        for sub_condition in condition:
+            value = self._resolve_expr(sub_condition, entry)
+            if not isinstance(value, str):
+                raise QueryError("$concat with non-string references")
+            parts.append(value)
+        return "".join(parts)
 
     def _resolve_expr(self, condition, entry):
-        if isinstance(condition, Mapping):
+        if _is_mapping(condition):
             assert len(condition) == 1
             operator, condition = next(iter(condition.items()))
-            try:
-                return getattr(self, "_expr_" + operator[1:])(condition, entry)
-            except AttributeError:
-                raise QueryError(
-                    "{!r} operator in $expr isn't supported".format(operator)
-                )
+            return self._expr_operator(operator)(condition, entry)
         elif is_non_string_sequence(condition):
             return [
                 self._resolve_expr(sub_condition, entry) for sub_condition in condition
             ]
         elif isinstance(condition, str) and condition.startswith("$"):
-            return self._extract(entry, condition[1:].split("."))
+            return _extractor_for(condition[1:])(entry)
         return condition
 
     def _process_expr_condition(self, operator, condition, entry):
         assert operator.startswith("$")
         assert isinstance(condition, Sequence)
 
-        # Mappings to query operators
-        QUERY_OPS = {
-            "$eq": self._eq,
-            "$gt": self._gt,
-            "$gte": self._gte,
-            "$in": self._in,
-            "$lt": self._lt,
-            "$lte": self._lte,
-            "$ne": self._ne,
-            "$nin": self._nin,
-        }
-        if operator in QUERY_OPS:
+        if operator in self._EXPR_QUERY_OPERATORS:
             assert len(condition) == 2
             resolved = [
                 self._resolve_expr(sub_condition, entry) for sub_condition in condition
             ]
-            result = QUERY_OPS[operator](resolved[1], resolved[0])
-            return result
+            return self._operator(operator)(resolved[1], resolved[0])
 
-        try:
-            return getattr(self, "_expr_" + operator[1:])(condition, entry)
-        except AttributeError:
+        return self._expr_operator(operator)(condition, entry)
+
+    #################
+    # Operator tables
+    #################
+
+    # Names of the methods implementing operators. Subclasses can support new
+    # operators by extending these tables, e.g.
+    # _OPERATORS = {**Query._OPERATORS, "$foo": "_foo"}
+    _OPERATORS = {
+        "$eq": "_eq",
+        "$gt": "_gt",
+        "$gte": "_gte",
+        "$in": "_in",
+        "$lt": "_lt",
+        "$lte": "_lte",
+        "$ne": "_ne",
+        "$nin": "_nin",
+        "$type": "_type",
+        "$exists": "_exists",
+        "$mod": "_mod",
+        "$options": "_options",
+        "$text": "_text",
+        "$where": "_where",
+        "$all": "_all",
+        "$size": "_size",
+        "$comment": "_comment",
+    }
+
+    _EXPR_OPERATORS = {
+        "$concat": "_expr_concat",
+    }
+
+    # Query operators which can be used in $expr to compare two expressions
+    _EXPR_QUERY_OPERATORS = frozenset(
+        ("$eq", "$gt", "$gte", "$in", "$lt", "$lte", "$ne", "$nin")
+    )
+
+    def _operator(self, operator):
+        """Returns the method implementing operator, bound to this query"""
+        name = self._OPERATORS.get(operator)
+        if name is None:
+            raise QueryError("{!r} operator isn't supported".format(operator))
+        return getattr(self, name)
+
+    def _expr_operator(self, operator):
+        """Returns the method implementing operator in $expr, bound to this query"""
+        name = self._EXPR_OPERATORS.get(operator)
+        if name is None:
             raise QueryError("{!r} operator in $expr isn't supported".format(operator))
+        return getattr(self, name)
 
-    def _expr(self, condition, entry):
-        assert isinstance(condition, Mapping)
-        return all(
-            self._process_expr_condition(sub_operator, sub_condition, entry)
-            for sub_operator, sub_condition in condition.items()
-        )
+    def _is_overridden(self, name):
+        """Returns True if the method called name isn't Query's own, in which case
+        it is called as is rather than being specialized when compiling"""
+        return getattr(type(self), name) is not getattr(Query, name, None)
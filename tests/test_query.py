@@ -1,7 +1,7 @@
 import re
 from unittest import TestCase
 
-from mongoquery import Query
+from mongoquery import Query, QueryError
 
 _FOOD = {
     "_id": 100,
@@ -358,3 +358,204 @@ class TestQuery(TestCase):
                 collection,
             ),
         )
+
+    def test_unsupported_operator(self):
+        with self.assertRaises(QueryError):
+            Query({"qty": {"$foo": 2}})
+        with self.assertRaises(QueryError):
+            Query({"qty": {"$not": {"$foo": 2}}})
+        with self.assertRaises(QueryError):
+            Query({"item": {"$not": {"$regex": "("}}})
+
+    def test_numeric_path_segments(self):
+        self.assertEqual([_FOOD], self._query({"memos.-1.by": "billing"}))
+        self.assertEqual([], self._query({"memos.5.by": "billing"}))
+        collection = [{"a": {"1": "foo"}}, {"a": ["bar", "foo"]}]
+        self.assertEqual(collection, self._query({"a.1": "foo"}, collection))
+
+    def test_invalid_regex(self):
+        with self.assertRaises(QueryError):
+            Query({"sku": {"$regex": "/(abc/"}})
+        with self.assertRaises(QueryError):
+            Query({"sku": {"$regex": 42}})
+
+    def test_logical(self):
+        self.assertEqual(
+            [_FRUIT],
+            self._query({"$and": [{"type": "fruit"}, {"qty": {"$lt": 20}}]}),
+        )
+        self.assertEqual(
+            _ALL,
+            self._query({"$or": [{"type": "fruit"}, {"item": {"$regex": "^x"}}]}),
+        )
+        self.assertEqual(
+            [_FOOD],
+            self._query({"$nor": [{"type": "fruit"}, {"qty": {"$gt": 30}}]}),
+        )
+        self.assertEqual([_FOOD], self._query({"qty": {"$not": {"$lt": 20}}}))
+
+    def test_dotted_path_exists(self):
+        self.assertEqual(_ALL, self._query({"memos.by": {"$exists": True}}))
+        self.assertEqual([], self._query({"memos.foo": {"$exists": True}}))
+        self.assertEqual([_FOOD], self._query({"ratings.2": {"$exists": True}}))
+        self.assertEqual([_FRUIT], self._query({"ratings.2": {"$exists": False}}))
+
+    def test_in_unhashable(self):
+        collection = [{"a": {"b": 1}}, {"a": [{"b": 2}, 3]}, {"a": [1, 2]}]
+        self.assertEqual(
+            collection[:2], self._query({"a": {"$in": [{"b": 1}, 3]}}, collection)
+        )
+        self.assertEqual(
+            collection[2:], self._query({"a": {"$nin": [{"b": 1}, 3]}}, collection)
+        )
+        self.assertEqual(
+            collection[2:], self._query({"a": {"$in": [[1, 2], 2]}}, collection)
+        )
+        self.assertEqual(collection[1:2], self._query({"a": {"$in": [3]}}, collection))
+
+    def test_compile_cache(self):
+        query = Query.compile({"qty": {"$in": [10, 42]}})
+        self.assertIs(query, Query.compile({"qty": {"$in": [10, 42]}}))
+        self.assertIsNot(query, Query.compile({"qty": {"$in": (10, 42)}}))
+        self.assertIsNot(Query.compile({"a": 1}), Query.compile({"a": True}))
+        self.assertEqual([_FRUIT], list(filter(query.match, _ALL)))
+
+        collection = [{"tags": {"a", "b"}}, {"tags": {"c"}}]
+        unhashable = Query.compile({"tags": {"a", "b"}})
+        self.assertIsNot(unhashable, Query.compile({"tags": {"a", "b"}}))
+        self.assertEqual(collection[:1], list(filter(unhashable.match, collection)))
+
+    def test_expr_operand_order(self):
+        with self.assertRaises(IndexError):
+            self._query(
+                {"$expr": {"$eq": ["$a.5", {"$concat": ["$n"]}]}},
+                [{"a": [1], "n": 3}],
+            )
+
+    def test_expr_concat_literals(self):
+        collection = [{"id": "000", "a": "1", "n": 1}]
+        self.assertEqual(
+            collection,
+            self._query(
+                {
+                    "$expr": {
+                        "$eq": [{"$concat": ["_", "$id", "_", "_", "$a"]}, "_000__1"]
+                    }
+                },
+                collection,
+            ),
+        )
+        self.assertEqual(
+            collection,
+            self._query(
+                {"$expr": {"$eq": [{"$concat": ["a", "b"]}, "ab"]}}, collection
+            ),
+        )
+        with self.assertRaises(QueryError):
+            Query({"$expr": {"$eq": [{"$concat": ["$id", 1]}, "0001"]}})
+        with self.assertRaises(QueryError):
+            self._query({"$expr": {"$eq": [{"$concat": ["$n"]}, "1"]}}, collection)
+
+    def test_elem_match_scalars(self):
+        collection = [{"results": [82, 85, 88]}, {"results": [75, 88, 89]}]
+        self.assertEqual(
+            collection[:1],
+            self._query(
+                {"results": {"$elemMatch": {"$gte": 80, "$lt": 85}}}, collection
+            ),
+        )
+        self.assertEqual(
+            collection[1:],
+            self._query({"results": {"$elemMatch": {"$mod": [10, 9]}}}, collection),
+        )
+
+    def test_exists_with_other_operators(self):
+        records = [{"a": 5}, {"a": 1}, {"b": 5}]
+        self.assertEqual(
+            records[:1],
+            self._query({"a": {"$exists": True, "$gt": 2}}, collection=records),
+        )
+        self.assertEqual(
+            [],
+            self._query({"a": {"$exists": False, "$gt": 2}}, collection=records),
+        )
+
+    def test_bad_logical_argument(self):
+        for operator in ("$and", "$nor", "$or"):
+            with self.assertRaises(QueryError):
+                Query({operator: {"type": "fruit"}})
+
+    def test_bad_elem_match_argument(self):
+        with self.assertRaises(QueryError):
+            Query({"memos": {"$elemMatch": 5}})
+
+    def test_bad_expr_argument(self):
+        with self.assertRaises(QueryError):
+            Query({"$expr": ["$id", "000"]})
+
+    def test_all_iterable(self):
+        self.assertEqual(_ALL, self._query({"ratings": {"$all": (5, 9)}}))
+        self.assertEqual([_FOOD], self._query({"ratings": {"$all": {5, 8}}}))
+
+    def test_expr_concat_not(self):
+        collection = [{"id": "000", "a": "1"}, {"id": "001", "a": "2", "n": 3}]
+        expr = {"$expr": {"$eq": [{"$concat": ["$id", "__", "$a"]}, "000__1"]}}
+        self.assertEqual(collection[1:], self._query({"$not": expr}, collection))
+        with self.assertRaises(QueryError):
+            self._query(
+                {"$not": {"$expr": {"$eq": [{"$concat": ["$n"]}, "3"]}}}, collection
+            )
+        # $concat directly under $expr is resolved by Query._expr_concat
+        self.assertEqual(
+            collection, self._query({"$expr": {"$concat": ["$id", "$a"]}}, collection)
+        )
+        with self.assertRaises(QueryError):
+            self._query({"$expr": {"$concat": ["$id", "$n"]}}, collection)
+
+    def test_logical_guard_order(self):
+        self.assertEqual(
+            [],
+            self._query(
+                {"$and": [{"a": {"$in": [2, 4, 6]}}, {"a": {"$mod": [2, 0]}}]},
+                [{"a": None}],
+            ),
+        )
+        self.assertEqual(
+            [{"a": "x"}],
+            self._query(
+                {"$or": [{"a": {"$regex": "x"}}, {"a": {"$mod": [2, 0]}}]},
+                [{"a": "x"}],
+            ),
+        )
+        self.assertEqual(
+            [],
+            self._query(
+                {
+                    "$and": [
+                        {"a": {"$elemMatch": {"$gt": 1}}},
+                        {"a": {"$size": "one"}},
+                    ]
+                },
+                [{"a": 5}],
+            ),
+        )
+
+    def test_subclass_operators(self):
+        class Custom(Query):
+            _OPERATORS = {**Query._OPERATORS, "$even": "_even"}
+
+            @staticmethod
+            def _gt(condition, entry):
+                return entry < condition
+
+            @staticmethod
+            def _even(condition, entry):
+                return (entry % 2 == 0) == condition
+
+        self.assertEqual(
+            [_FRUIT], list(filter(Custom({"qty": {"$gt": 20}}).match, _ALL))
+        )
+        self.assertEqual(
+            [_FRUIT], list(filter(Custom({"qty": {"$even": True}}).match, _ALL))
+        )
+        self.assertEqual([_FOOD], self._query({"qty": {"$gt": 20}}))